@@ -1,4 +1,5 @@
-from .dependency_graph_builder import DependencyGraphBuilder
+from typing import TYPE_CHECKING
+
 from .dependency import Dependency
 from .import_visitor import ImportVisitor
 from .project_analyzer import ProjectAnalyzer
@@ -6,6 +7,9 @@ from .project_detector import ProjectDetector
 from .project_structure import ProjectStructure
 from .python_module import PythonModule
 
+if TYPE_CHECKING:
+    from .dependency_graph_builder import DependencyGraphBuilder
+
 __all__ = [
     "DependencyGraphBuilder",
     "Dependency",
@@ -15,3 +19,13 @@ __all__ = [
     "ProjectStructure",
     "PythonModule",
 ]
+
+
+def __getattr__(name: str):
+    """Загружает построитель графа (и graphviz) только при первом обращении."""
+    if name == "DependencyGraphBuilder":
+        from .dependency_graph_builder import DependencyGraphBuilder
+
+        globals()[name] = DependencyGraphBuilder
+        return DependencyGraphBuilder
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
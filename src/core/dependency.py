@@ -3,7 +3,7 @@ from .python_module import PythonModule
 from typing import List
 
 
-@dataclass
+@dataclass(slots=True, frozen=True, eq=False)
 class Dependency:
     """Представляет зависимость между двумя модулями."""
 
@@ -1,7 +1,54 @@
 import graphviz
 import logging
+from typing import Dict, Optional
+from xml.sax.saxutils import escape, quoteattr
 from .project_analyzer import ProjectAnalyzer
-from .project_structure import ProjectStructure
+
+# Число модулей, начиная с которого граф считается большим
+_LARGE_GRAPH_THRESHOLD = 150
+# Число модулей, начиная с которого dot заменяется на sfdp
+_SFDP_THRESHOLD = 500
+# Число модулей, начиная с которого граф дополнительно сохраняется в GraphML
+_GRAPHML_THRESHOLD = 2000
+
+# Общие атрибуты узлов графа
+_BASE_NODE_ATTRS = {
+    "shape": "box",
+    "style": "filled,rounded",  # Скругленные углы для узлов
+    "fillcolor": "white",
+    "fontcolor": "#333333",  # Темно-серый текст
+    "fontsize": "11",
+    "fontname": "Arial",
+    "height": "0.4",
+    "margin": "0.15,0.1",
+    "penwidth": "1.0",  # Более тонкая обводка
+}
+
+# Общие атрибуты рёбер: улучшенный стиль стрелок с изогнутыми линиями
+_BASE_EDGE_ATTRS = {
+    "fontsize": "9",
+    "fontname": "Arial",
+    "fontcolor": "#555555",
+    "penwidth": "0.7",  # Более тонкие линии
+    "arrowsize": "0.6",  # Маленькие наконечники стрелок
+    "color": "#55555570",  # Полупрозрачные стрелки
+    "arrowhead": "vee",  # Стильный наконечник стрелки
+    "constraint": "true",  # Сохранять иерархию (важно для уменьшения пересечений)
+    "weight": "1.5",  # Предпочтительный вес для важных соединений
+}
+
+# Экранирование кавычек в строках DOT
+_DOT_ESCAPE = str.maketrans({'"': '\\"'})
+
+
+def _quote(value: str) -> str:
+    """Заключает строку в кавычки для использования в DOT."""
+    return f'"{value.translate(_DOT_ESCAPE)}"'
+
+
+def _format_attrs(attrs: Dict[str, str]) -> str:
+    """Форматирует словарь атрибутов в строку DOT вида key="value"."""
+    return " ".join(f"{key}={_quote(value)}" for key, value in attrs.items())
 
 
 class DependencyGraphBuilder:
@@ -12,6 +59,10 @@ class DependencyGraphBuilder:
         analyzer: ProjectAnalyzer,
         reverse_arrows: bool = True,
         logger: logging.Logger = None,
+        large_graph: Optional[bool] = None,
+        engine: str = "auto",
+        graphml_path: Optional[str] = None,
+        rankdir: str = "TB",
     ) -> None:
         """
         Инициализирует построитель графа.
@@ -19,152 +70,214 @@ class DependencyGraphBuilder:
         Args:
             analyzer: Анализатор проекта с информацией о модулях и зависимостях
             reverse_arrows: Обратить направление стрелок (True - показывает, кто использует модуль)
+            large_graph: Использовать упрощенную компоновку для больших графов
+                (None - определяется автоматически по числу модулей)
+            engine: Движок компоновки: "auto" (dot или sfdp по числу модулей),
+                имя движка Graphviz или "graphml" (sfdp и экспорт в GraphML)
+            graphml_path: Путь к GraphML-файлу для экспорта графа
+            rankdir: Направление графа (TB, LR, BT, RL)
         """
         self.analyzer = analyzer
         self.reverse_arrows = reverse_arrows
         self.logger = logger
+        self.large_graph = large_graph
+        self.engine = engine
+        self.graphml_path = graphml_path
+        self.rankdir = rankdir
+
+    def resolve_engine(self) -> str:
+        """Определяет движок компоновки с учетом размера графа."""
+        if self.engine == "graphml":
+            return "sfdp"
+        if self.engine != "auto":
+            return self.engine
+        if len(self.analyzer.modules) > _SFDP_THRESHOLD:
+            return "sfdp"
+        return "dot"
+
+    def needs_graphml(self) -> bool:
+        """Проверяет, нужно ли дополнительно сохранить граф в GraphML."""
+        if self.engine == "graphml":
+            return True
+        return self.engine == "auto" and len(self.analyzer.modules) > _GRAPHML_THRESHOLD
 
     def build_graph(self) -> graphviz.Digraph:
         """Строит ориентированный граф зависимостей с улучшенной визуализацией."""
+        engine = self.resolve_engine()
+
+        # Общие атрибуты узлов и рёбер задаются один раз для всего графа
         graph = graphviz.Digraph(
             name="python_imports",
             comment="Python Import Dependencies",
             format="svg",
-            engine="dot",
+            engine=engine,
+            node_attr=_BASE_NODE_ATTRS,
+            edge_attr=_BASE_EDGE_ATTRS,
         )
 
         # Улучшенные глобальные атрибуты графа для минимизации пересечений
         graph.attr(
-            rankdir="TB",  # Компоновка сверху вниз
-            splines="curved",  # Изогнутые линии для лучшей визуализации
+            rankdir=self.rankdir,  # Направление компоновки, по умолчанию сверху вниз
             fontsize="12",
             fontname="Arial",
             nodesep="1.0",  # Увеличенное расстояние между узлами
-            ranksep="2.0",  # Увеличенное расстояние между рангами
             overlap="false",  # Предотвращение перекрытия узлов
             compound="true",  # Разрешение составных рёбер между кластерами
             bgcolor="white",  # Белый фон
             pad="1.5",  # Увеличенный отступ для лучшей компоновки
-            concentrate="true",  # Объединение общих сегментов рёбер
             # Важные атрибуты для минимизации пересечений:
             ordering="out",  # Упорядочение узлов для уменьшения пересечений
-            sep="+25,25",  # Увеличение минимального расстояния между узлами
-            mclimit="2.0",  # Увеличение итераций компоновки
             pack="true",  # Упаковка несвязанных компонентов
             packmode="cluster",  # Режим упаковки кластеров для лучшего расположения
         )
 
-        # Создание кластеров с улучшенным стилем
-        clusters = {}
-        for cluster_name in set(
-            self.analyzer.project_structure.cluster_mappings.values()
-        ):
-            idx = list(self.analyzer.project_structure.cluster_mappings.values()).index(
-                cluster_name
+        large_graph = self.large_graph
+        if large_graph is None:
+            large_graph = len(self.analyzer.modules) > _LARGE_GRAPH_THRESHOLD
+
+        if large_graph:
+            # Изогнутые линии, объединение рёбер и дополнительные итерации
+            # делают компоновку dot слишком долгой на сотнях узлов
+            graph.attr(
+                splines="ortho",  # Ортогональные линии
+                ranksep="2",  # Увеличенное расстояние между рангами
+                outputorder="edgesfirst",  # Рёбра рисуются под узлами
+                mclimit="1.0",  # Стандартное число итераций компоновки
             )
-            color = ProjectStructure.CLUSTER_COLORS[
-                idx % len(ProjectStructure.CLUSTER_COLORS)
-            ]
-
-            subgraph = graphviz.Digraph(name=f"cluster_{cluster_name}")
-            subgraph.attr(
-                label=cluster_name,
-                style="filled,rounded",  # Добавлены скругленные углы
-                fillcolor=color,
-                fontcolor="#333333",  # Темно-серый цвет шрифта
-                fontsize="16",
-                fontname="Arial Bold",
-                color="#88888860",  # Полупрозрачная рамка
-                penwidth="1.5",
-                margin="20",  # Увеличенные отступы
-                labeljust="l",  # Выравнивание метки по левому краю
+        else:
+            graph.attr(
+                splines="curved",  # Изогнутые линии для лучшей визуализации
+                ranksep="2.0",  # Увеличенное расстояние между рангами
+                concentrate="true",  # Объединение общих сегментов рёбер
+                sep="+25,25",  # Увеличение минимального расстояния между узлами
+                mclimit="2.0",  # Увеличение итераций компоновки
             )
-            clusters[cluster_name] = subgraph
 
-        # Добавление узлов в соответствующие кластеры
-        added_nodes = set()
+        if engine == "sfdp":
+            # Силовая компоновка масштабируется на тысячи узлов лучше, чем dot
+            graph.attr(K="1.2", repulsiveforce="1.5")
 
-        # Группируем модули по кластерам для лучшей структуризации
-        cluster_modules = {}
-        for cluster_name in set(
-            self.analyzer.project_structure.cluster_mappings.values()
-        ):
-            cluster_modules[cluster_name] = []
-
-        for module in self.analyzer.modules.values():
-            cluster_modules[module.cluster].append(module)
+        # Строки DOT формируются напрямую, без вызовов Digraph.node/edge
+        body = []
+        added_nodes = set()
 
-        # Добавляем узлы, сортируя их внутри кластера для лучшей организации
-        for cluster_name, modules in cluster_modules.items():
-            # Сортируем модули по имени для более организованного расположения
-            modules.sort(key=lambda m: m.module_name)
+        # Добавление кластеров в основной граф в определенном порядке
+        project_structure = self.analyzer.project_structure
+        for cluster_name in project_structure.cluster_order:
+            # Кластер с улучшенным стилем
+            cluster_attrs = _format_attrs(
+                {
+                    "label": cluster_name,
+                    "style": "filled,rounded",  # Добавлены скругленные углы
+                    "fillcolor": project_structure.cluster_to_color[cluster_name],
+                    "fontcolor": "#333333",  # Темно-серый цвет шрифта
+                    "fontsize": "16",
+                    "fontname": "Arial Bold",
+                    "color": "#88888860",  # Полупрозрачная рамка
+                    "penwidth": "1.5",
+                    "margin": "20",  # Увеличенные отступы
+                    "labeljust": "l",  # Выравнивание метки по левому краю
+                }
+            )
+            body.append(f"\tsubgraph {_quote(f'cluster_{cluster_name}')} {{\n")
+            body.append(f"\t\tgraph [{cluster_attrs}]\n")
 
-            for module in modules:
+            # Модули уже отсортированы по имени для более организованного расположения
+            for module in self.analyzer.modules_by_cluster.get(cluster_name, ()):
                 if module.file_path not in added_nodes:
-                    label = self.analyzer.get_node_label(
-                        module.file_path, module.cluster
-                    )
-
-                    # Добавляем узел с улучшенным стилем
-                    clusters[module.cluster].node(
-                        module.file_path,
-                        label=label,
-                        shape="box",
-                        style="filled,rounded",  # Скругленные углы для узлов
-                        fillcolor="white",
-                        fontcolor="#333333",  # Темно-серый текст
-                        fontsize="11",
-                        fontname="Arial",
-                        height="0.4",
-                        margin="0.15,0.1",
-                        penwidth="1.0",  # Более тонкая обводка
-                    )
+                    node_id = _quote(module.file_path)
+                    body.append(f"\t\t{node_id} [label={_quote(module.label)}]\n")
                     added_nodes.add(module.file_path)
 
-        # Добавление всех кластеров в основной граф в определенном порядке
-        for cluster_name in self.analyzer.project_structure.cluster_order:
-            if cluster_name in clusters:
-                graph.subgraph(clusters[cluster_name])
+            body.append("\t}\n")
+
+        # Ортогональные линии dot не поддерживают метки рёбер (label), поэтому
+        # в большом графе используются внешние метки и подсказка всего ребра
+        if large_graph:
+            label_attr, tooltip_attr = "xlabel", "tooltip"
+        else:
+            label_attr, tooltip_attr = "label", "labeltooltip"
 
-        # Добавление рёбер между узлами с улучшенным стилем
-        for dep in self.analyzer.dependencies:
+        # Добавление рёбер между узлами
+        for dep in self.analyzer.iter_edges():
             source = dep.source_module.file_path
             target = dep.target_module.file_path
 
             if source == target:
                 continue  # Пропускаем самоссылки
 
-            # Улучшенный стиль стрелок с изогнутыми линиями
-            edge_attrs = {
-                "fontsize": "9",
-                "fontname": "Arial",
-                "fontcolor": "#555555",
-                "penwidth": "0.7",  # Более тонкие линии
-                "arrowsize": "0.6",  # Маленькие наконечники стрелок
-                "color": "#55555570",  # Полупрозрачные стрелки
-                "arrowhead": "vee",  # Стильный наконечник стрелки
-                "constraint": "true",  # Сохранять иерархию (важно для уменьшения пересечений)
-                "weight": "1.5",  # Предпочтительный вес для важных соединений
-            }
-
-            if dep.imported_objects:
-                # Структурированное отображение импортируемых объектов
-                if len(dep.imported_objects) > 3:
-                    label = f"{', '.join(dep.imported_objects[:3])}..."
-                else:
-                    label = ", ".join(dep.imported_objects)
-                edge_attrs["label"] = label
-                edge_attrs["labeltooltip"] = ", ".join(
-                    dep.imported_objects
-                )  # Всплывающая подсказка
-
             # Обратное направление стрелок в зависимости от параметра
             if self.reverse_arrows:
-                graph.edge(target, source, **edge_attrs)
-            else:
-                graph.edge(source, target, **edge_attrs)
+                source, target = target, source
+            edge = f"\t{_quote(source)} -> {_quote(target)}"
+
+            objects = dep.imported_objects
+            if objects:
+                # Структурированное отображение импортируемых объектов,
+                # всплывающая подсказка содержит полный список
+                if len(objects) > 3:
+                    label = _quote(f"{', '.join(objects[:3])}...")
+                    tooltip = _quote(", ".join(objects))
+                else:
+                    label = tooltip = _quote(", ".join(objects))
+                edge = f"{edge} [{label_attr}={label} {tooltip_attr}={tooltip}]"
+
+            body.append(f"{edge}\n")
+
+        graph.body.extend(body)
 
         self.logger.info(
-            f"Создан граф с {len(added_nodes)} узлами и {len(self.analyzer.dependencies)} рёбрами"
+            f"Создан граф с {len(added_nodes)} узлами и {len(self.analyzer.edge_objects)} рёбрами"
         )
+
+        if self.needs_graphml():
+            if self.graphml_path:
+                self.write_graphml(self.graphml_path)
+                self.logger.info(
+                    f"Граф сохранен в GraphML: {self.graphml_path}. "
+                    "Для интерактивного просмотра откройте его в Gephi или yEd"
+                )
+            else:
+                self.logger.warning("Не указан путь для экспорта графа в GraphML")
         return graph
+
+    def write_graphml(self, path: str) -> None:
+        """
+        Сохраняет граф зависимостей в формате GraphML.
+
+        Args:
+            path: Путь к выходному файлу
+        """
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n',
+            '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n',
+            '  <key id="cluster" for="node" attr.name="cluster" attr.type="string"/>\n',
+            '  <key id="objects" for="edge" attr.name="objects" attr.type="string"/>\n',
+            '  <graph id="python_imports" edgedefault="directed">\n',
+        ]
+
+        for module in self.analyzer.module_list:
+            lines.append(
+                f"    <node id={quoteattr(module.file_path)}>"
+                f'<data key="label">{escape(module.label or module.module_name)}</data>'
+                f'<data key="cluster">{escape(module.cluster)}</data></node>\n'
+            )
+
+        for dep in self.analyzer.iter_edges():
+            source = dep.source_module.file_path
+            target = dep.target_module.file_path
+            if source == target:
+                continue
+            # Направление рёбер совпадает с направлением стрелок на диаграмме
+            if self.reverse_arrows:
+                source, target = target, source
+            objects = escape(", ".join(dep.imported_objects))
+            lines.append(
+                f"    <edge source={quoteattr(source)} target={quoteattr(target)}>"
+                f'<data key="objects">{objects}</data></edge>\n'
+            )
+
+        lines.append("  </graph>\n</graphml>\n")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
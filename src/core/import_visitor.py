@@ -1,6 +1,171 @@
 import ast
 import logging
-from typing import List, Tuple
+import re
+from typing import List, Optional, Tuple
+
+try:
+    from fast_walk import walk_unordered
+
+    FAST_WALK_AVAILABLE = True
+except ImportError:
+    FAST_WALK_AVAILABLE = False
+
+# Однострочные импорты вида "import x" и "from .x import y"
+_IMPORT_RE = re.compile(
+    rb"^[ \t]*(?:from[ \t]+(\.*)([\w.]*)[ \t]+import[ \t]+([^\n#]*)"
+    rb"|import[ \t]+([^\n#]*))",
+    re.MULTILINE,
+)
+# Любое вхождение ключевого слова import, в том числе внутри составных операторов
+_IMPORT_WORD_RE = re.compile(rb"\bimport\b")
+# Строки в тройных кавычках (docstring), в которых может встречаться слово import
+_TRIPLE_QUOTED_RE = re.compile(rb"(\"{3}|'{3})[\s\S]*?\1")
+# Элемент списка импорта: "x", "x.y", "*" или "x as z"
+_ALIAS_RE = re.compile(rb"([\w.]+|\*)(?:[ \t]+as[ \t]+\w+)?")
+
+
+def extract_import(node: ast.Import, module_name: str) -> List[Tuple[str, List[str]]]:
+    """Извлекает импорты из узла вида 'import x'."""
+    return [(name.name, []) for name in node.names]
+
+
+def extract_import_from(
+    node: ast.ImportFrom,
+    module_name: str,
+    module_parts: Optional[List[str]] = None,
+    logger: Optional[logging.Logger] = None,
+) -> List[Tuple[str, List[str]]]:
+    """
+    Извлекает импорты из узла вида 'from x import y'.
+
+    Args:
+        node: Узел импорта
+        module_name: Имя текущего модуля
+        module_parts: Заранее разбитое по точкам имя модуля
+        logger: Логгер для предупреждений об импортах со звездочкой
+    """
+    if module_parts is None:
+        module_parts = module_name.split(".")
+
+    # Родительский пакет для относительных импортов
+    level = node.level
+    if level:
+        if level > len(module_parts):
+            return []
+        parent_module = ".".join(module_parts[: len(module_parts) - level])
+    else:
+        parent_module = ""
+
+    if node.module is None:
+        # Относительные импорты типа "from . import x"
+        imports: List[Tuple[str, List[str]]] = []
+        for name in node.names:
+            if name.name == "*":
+                if logger:
+                    logger.warning(f"Пропущен импорт со звездочкой в {module_name}")
+                continue
+            if parent_module:
+                imports.append((f"{parent_module}.{name.name}", []))
+            else:
+                imports.append((name.name, []))
+        return imports
+
+    # Импорты типа "from x import y" и "from .x import y"
+    if parent_module:
+        full_module = f"{parent_module}.{node.module}"
+    else:
+        full_module = node.module
+    imported_objects = [name.name for name in node.names if name.name != "*"]
+    return [(full_module, imported_objects)]
+
+
+def _parse_aliases(names: bytes) -> Optional[List[ast.alias]]:
+    """Разбирает список импортируемых имен, None - если он не однострочный."""
+    aliases = []
+    for item in names.split(b","):
+        match = _ALIAS_RE.fullmatch(item.strip())
+        if match is None:
+            return None
+        aliases.append(ast.alias(name=match.group(1).decode("utf-8")))
+    return aliases
+
+
+def scan_imports(
+    source: bytes, module_name: str, logger: Optional[logging.Logger] = None
+) -> Optional[List[Tuple[str, List[str]]]]:
+    """
+    Извлекает импорты регулярным выражением, без построения AST.
+
+    Args:
+        source: Исходный код модуля в байтах
+        module_name: Имя текущего модуля
+        logger: Логгер для предупреждений об импортах со звездочкой
+
+    Returns:
+        Список пар (имя импортируемого модуля, импортированные объекты) или
+        None, если в коде есть импорты в скобках, с переносом строки, имена
+        не в UTF-8 или другие конструкции, для которых нужен ast.parse
+    """
+    if b'"""' in source or b"'''" in source:
+        source = _TRIPLE_QUOTED_RE.sub(b"", source)
+
+    matches = _IMPORT_RE.findall(source)
+    if len(matches) != len(_IMPORT_WORD_RE.findall(source)):
+        return None
+
+    imports: List[Tuple[str, List[str]]] = []
+    module_parts = module_name.split(".")
+    for dots, from_module, from_names, import_names in matches:
+        try:
+            aliases = _parse_aliases(from_names or import_names)
+            module = from_module.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        if aliases is None:
+            return None
+
+        if import_names:
+            imports.extend(extract_import(ast.Import(names=aliases), module_name))
+        else:
+            node = ast.ImportFrom(
+                module=module or None, names=aliases, level=len(dots)
+            )
+            imports.extend(
+                extract_import_from(node, module_name, module_parts, logger)
+            )
+    return imports
+
+
+def collect_imports(
+    tree: ast.AST, module_name: str, logger: logging.Logger
+) -> List[Tuple[str, List[str]]]:
+    """
+    Собирает все импорты из AST дерева модуля.
+
+    Использует fast_walk, если он установлен, иначе ImportVisitor.
+
+    Args:
+        tree: AST дерево модуля
+        module_name: Имя текущего модуля
+
+    Returns:
+        Список пар (имя импортируемого модуля, импортированные объекты)
+    """
+    if not FAST_WALK_AVAILABLE:
+        visitor = ImportVisitor(module_name, logger)
+        visitor.visit(tree)
+        return visitor.imports
+
+    imports: List[Tuple[str, List[str]]] = []
+    module_parts = module_name.split(".")
+    for node in walk_unordered(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(extract_import(node, module_name))
+        elif isinstance(node, ast.ImportFrom):
+            imports.extend(
+                extract_import_from(node, module_name, module_parts, logger)
+            )
+    return imports
 
 
 class ImportVisitor(ast.NodeVisitor):
@@ -14,52 +179,18 @@ class ImportVisitor(ast.NodeVisitor):
             module_name: Имя текущего модуля
         """
         self.module_name = module_name
+        self._parts = module_name.split(".")
         self.imports: List[Tuple[str, List[str]]] = []
         self.logger = logger
 
     def visit_Import(self, node: ast.Import) -> None:
         """Обрабатывает простые импорты вида 'import x'."""
-        for name in node.names:
-            self.imports.append((name.name, []))
+        self.imports.extend(extract_import(node, self.module_name))
         self.generic_visit(node)
 
     def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
         """Обрабатывает импорты вида 'from x import y'."""
-        if node.module is None and node.level > 0:
-            # Относительные импорты типа "from . import x"
-            parts = self.module_name.split(".")
-            if node.level <= len(parts):
-                parent_module = ".".join(parts[: -node.level])
-                for name in node.names:
-                    if name.name == "*":
-                        self.logger.warning(
-                            f"Пропущен импорт со звездочкой в {self.module_name}"
-                        )
-                        continue
-                    if parent_module:
-                        full_module = f"{parent_module}.{name.name}"
-                    else:
-                        full_module = name.name
-                    self.imports.append((full_module, []))
-        elif node.level > 0:
-            # Относительные импорты типа "from .x import y"
-            parts = self.module_name.split(".")
-            if node.level <= len(parts):
-                parent_module = ".".join(parts[: -node.level])
-                if parent_module and node.module:
-                    full_module = f"{parent_module}.{node.module}"
-                elif node.module:
-                    full_module = node.module
-                else:
-                    full_module = parent_module
-
-                imported_objects = [
-                    name.name for name in node.names if name.name != "*"
-                ]
-                self.imports.append((full_module, imported_objects))
-        else:
-            # Абсолютные импорты типа "from x import y"
-            imported_objects = [name.name for name in node.names if name.name != "*"]
-            self.imports.append((node.module, imported_objects))
-
+        self.imports.extend(
+            extract_import_from(node, self.module_name, self._parts, self.logger)
+        )
         self.generic_visit(node)
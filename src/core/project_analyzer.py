@@ -1,12 +1,185 @@
-from typing import List, Dict, Set, Optional
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+import codecs
 import os
+import sys
 import ast
+import json
+import tempfile
 from .project_structure import ProjectStructure
 from .python_module import PythonModule
-from .import_visitor import ImportVisitor
+from .import_visitor import collect_imports, scan_imports
 from .dependency import Dependency
 import logging
 
+# Минимальное число файлов, при котором разбор выполняется в нескольких процессах
+_PARALLEL_THRESHOLD = 25
+
+# Кэш извлеченных импортов между запусками
+_CACHE_DIR = ".dep_graph_cache"
+_CACHE_FILE = "imports.json"
+_CACHE_VERSION = 3  # Увеличивается при изменении логики извлечения импортов
+
+# Операторы верхнего уровня, которые могут встречаться в блоке импортов
+_PREFIX_KEYWORDS = frozenset(
+    (b"import", b"from", b"try", b"except", b"else", b"finally", b"if", b"elif")
+)
+
+# Размер буфера чтения исходных файлов
+_READ_BUFFER_SIZE = 1 << 20
+
+# Директория пакета: ProjectDetector возвращает ее, если корень проекта не найден
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _is_valid_cache_entry(entry) -> bool:
+    """
+    Проверяет формат записи кэша: [mtime_ns, размер, имя модуля, импорты].
+
+    Кэш может оказаться в анализируемом репозитории, поэтому записи
+    неверного формата считаются промахом кэша, а не ошибкой.
+    """
+    if not (isinstance(entry, list) and len(entry) == 4):
+        return False
+    mtime_ns, size, module_name, imports = entry
+    if not (
+        isinstance(mtime_ns, int)
+        and isinstance(size, int)
+        and isinstance(module_name, str)
+        and isinstance(imports, list)
+    ):
+        return False
+    for item in imports:
+        if not (isinstance(item, list) and len(item) == 2):
+            return False
+        name, objects = item
+        if not (isinstance(name, str) and isinstance(objects, list)):
+            return False
+        if not all(isinstance(obj, str) for obj in objects):
+            return False
+    return True
+
+
+def _track_triple_quotes(line: bytes, quote: Optional[bytes]) -> Optional[bytes]:
+    """
+    Определяет, остается ли открытой многострочная строка после данной строки.
+
+    Args:
+        line: Строка исходного кода
+        quote: Тройные кавычки строки, открытой до начала line, или None
+
+    Returns:
+        Тройные кавычки строки, открытой в конце line, или None
+    """
+    pos = 0
+    while True:
+        if quote is not None:
+            # Строку закрывают только такие же кавычки, какими она открыта
+            end = line.find(quote, pos)
+            if end == -1:
+                return quote
+            quote = None
+            pos = end + 3
+        else:
+            double = line.find(b'"""', pos)
+            single = line.find(b"'''", pos)
+            if double == -1 and single == -1:
+                return None
+            if single == -1 or (double != -1 and double < single):
+                quote, pos = b'"""', double + 3
+            else:
+                quote, pos = b"'''", single + 3
+
+
+def _import_prefix(source: bytes) -> bytes:
+    """
+    Возвращает начало исходного кода, содержащее импорты верхнего уровня.
+
+    Просматривает файл построчно и останавливается на первом операторе верхнего
+    уровня, который не является импортом, docstring, комментарием, служебной
+    переменной вроде __all__ или блоком try/if с условными импортами.
+    Маркер BOM в начале файла пропускается, но остается в результате.
+    """
+    pos = len(codecs.BOM_UTF8) if source.startswith(codecs.BOM_UTF8) else 0
+    length = len(source)
+    depth = 0  # Глубина открытых скобок
+    continued = False  # Предыдущая строка заканчивается на "\\"
+    quote = None  # Кавычки открытой многострочной строки
+
+    while pos < length:
+        end = source.find(b"\n", pos)
+        end = length if end == -1 else end + 1
+        line = source[pos:end]
+        stripped = line.strip()
+
+        if (
+            stripped
+            and quote is None
+            and not depth
+            and not continued
+            and line[:1] not in b" \t#"
+            # Строки, в том числе с префиксами r"", b"" и т.п.
+            and stripped.lstrip(b"rRuUbBfF")[:1] not in b"\"'"
+        ):
+            token = stripped.split(None, 1)[0].partition(b":")[0]
+            # Служебные переменные модуля (__all__, __version__) часто
+            # объявляются до импортов
+            if token not in _PREFIX_KEYWORDS and not token.startswith(b"__"):
+                break
+
+        quote = _track_triple_quotes(line, quote)
+        if quote is None:
+            opened = line.count(b"(") + line.count(b"[") + line.count(b"{")
+            closed = line.count(b")") + line.count(b"]") + line.count(b"}")
+            depth = max(depth + opened - closed, 0)
+            continued = stripped.endswith(b"\\")
+
+        pos = end
+
+    return source[:pos]
+
+
+def _parse_import_prefix(source: bytes, prefix: bytes, filename: str) -> ast.Module:
+    """Разбирает только блок импортов в начале файла, при ошибке - весь файл."""
+    if len(prefix) < len(source):
+        try:
+            return ast.parse(prefix, filename)
+        except SyntaxError:
+            pass
+    return ast.parse(source, filename)
+
+
+def _extract_imports(
+    file_path: str, module_name: str, logger: Optional[logging.Logger] = None
+) -> List[Tuple[str, List[str]]]:
+    """
+    Читает файл модуля и извлекает из него импорты.
+
+    Args:
+        file_path: Путь к файлу модуля
+        module_name: Имя модуля
+        logger: Логгер для предупреждений (в дочерних процессах - логгер модуля)
+    """
+    # ast.parse принимает байты и сам учитывает объявление кодировки файла
+    with open(file_path, "rb", buffering=_READ_BUFFER_SIZE) as f:
+        content = f.read()
+
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    prefix = _import_prefix(content)
+
+    # Простые однострочные импорты извлекаются без построения AST,
+    # BOM нужен только ast.parse для определения кодировки
+    imports = scan_imports(prefix.removeprefix(codecs.BOM_UTF8), module_name, logger)
+    if imports is None:
+        tree = _parse_import_prefix(content, prefix, file_path)
+        imports = collect_imports(tree, module_name, logger)
+    return imports
+
 
 class ProjectAnalyzer:
     """Анализирует структуру проекта и зависимости между модулями."""
@@ -16,6 +189,7 @@ class ProjectAnalyzer:
         project_root: str,
         project_structure: ProjectStructure,
         logger: logging.Logger,
+        use_cache: bool = True,
     ) -> None:
         """
         Инициализирует анализатор проекта.
@@ -23,26 +197,62 @@ class ProjectAnalyzer:
         Args:
             project_root: Корневая директория проекта
             project_structure: Структура проекта с определением кластеров
+            use_cache: Использовать кэш импортов в директории .dep_graph_cache
+                корня проекта (кроме случая, когда корнем оказалась директория
+                самого пакета)
         """
         self.project_root = project_root
         self.project_structure = project_structure
         self.modules: Dict[str, PythonModule] = {}  # модули по путям
+        self.module_list: List[PythonModule] = []  # модули по номерам (idx)
         self.module_by_name: Dict[str, PythonModule] = {}  # модули по именам
-        self.dependencies: Set[Dependency] = set()
+        # модули по кластерам, отсортированные по имени
+        self.modules_by_cluster: Dict[str, List[PythonModule]] = defaultdict(list)
+        # Самый длинный подмодуль для каждого префикса имени модуля
+        self._descendant_index: Dict[str, PythonModule] = {}
+        # Рёбра зависимостей в виде параллельных массивов номеров модулей
+        self.edge_src = array("i")  # номер импортирующего модуля
+        self.edge_dst = array("i")  # номер импортируемого модуля
+        self.edge_objects: List[List[str]] = []  # импортированные объекты
+        self._edge_ids: Dict[int, int] = {}  # src * N + dst -> номер ребра
         self.logger = logger
+        # Если корень проекта не найден, ProjectDetector возвращает директорию
+        # пакета: кэш в нее не записывается
+        self.use_cache = use_cache and os.path.abspath(project_root) != _PACKAGE_DIR
+
+        # Префиксы путей кластеров от самых длинных к самым коротким:
+        # (префикс с "/", путь пакета, имя кластера)
+        root_package = project_structure.root_package_name
+        self._cluster_prefixes: List[Tuple[str, str, str]] = [
+            (f"{root_package}/{path_prefix}/", f"{root_package}/{path_prefix}", name)
+            for path_prefix, name in sorted(
+                project_structure.cluster_mappings.items(),
+                key=lambda item: -len(item[0]),
+            )
+            if path_prefix
+        ]
+        self._root_cluster: Optional[str] = project_structure.cluster_mappings.get("")
+        self.cache_path = os.path.join(project_root, _CACHE_DIR, _CACHE_FILE)
 
     def find_python_files(self) -> List[str]:
         """Находит все Python файлы в проекте."""
         python_files = []
-        for dirpath, dirnames, filenames in os.walk(self.project_root):
-            # Пропускаем директории __pycache__ и другие скрытые директории
-            dirnames[:] = [
-                d for d in dirnames if not d.startswith("__") and not d.startswith(".")
-            ]
-
-            for filename in filenames:
-                if filename.endswith(".py"):
-                    python_files.append(os.path.join(dirpath, filename))
+        pending = deque([self.project_root])
+        while pending:
+            try:
+                entries = os.scandir(pending.popleft())
+            except OSError:
+                continue
+
+            with entries:
+                for entry in entries:
+                    name = entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        # Пропускаем директории __pycache__ и другие скрытые директории
+                        if not name.startswith("__") and not name.startswith("."):
+                            pending.append(entry.path)
+                    elif name.endswith(".py"):
+                        python_files.append(entry.path)
 
         self.logger.info(f"Найдено {len(python_files)} Python файлов")
         return python_files
@@ -64,7 +274,18 @@ class ProjectAnalyzer:
 
     def get_module_name(self, file_path: str) -> str:
         """Определяет имя модуля из пути к файлу."""
-        rel_path = self.normalize_path(file_path)
+        return self._module_name_from_rel(file_path, self.normalize_path(file_path))
+
+    def get_cluster_for_file(self, file_path: str) -> str:
+        """Определяет кластер, к которому относится файл."""
+        return self._cluster_from_rel(self.normalize_path(file_path))
+
+    def get_node_label(self, file_path: str, cluster: str) -> str:
+        """Генерирует читаемую метку для узла."""
+        return self._label_from_rel(file_path, self.normalize_path(file_path), cluster)
+
+    def _module_name_from_rel(self, file_path: str, rel_path: str) -> str:
+        """Определяет имя модуля по нормализованному пути к файлу."""
         root_package = self.project_structure.root_package_name
 
         # Обработка для __init__.py
@@ -78,47 +299,33 @@ class ProjectAnalyzer:
         module_path = os.path.splitext(rel_path)[0]
         return module_path.replace(os.sep, ".")
 
-    def get_cluster_for_file(self, file_path: str) -> str:
-        """Определяет кластер, к которому относится файл."""
-        rel_path = self.normalize_path(file_path)
-        root_package = self.project_structure.root_package_name
+    def _cluster_from_rel(self, rel_path: str) -> str:
+        """Определяет кластер по нормализованному пути к файлу."""
+        # Наиболее длинные (конкретные) префиксы проверяются первыми
+        for prefix, package_path, cluster_name in self._cluster_prefixes:
+            if rel_path.startswith(prefix) or rel_path == package_path:
+                return cluster_name
 
-        for (
-            path_prefix,
-            cluster_name,
-        ) in self.project_structure.cluster_mappings.items():
-            if path_prefix == "":
-                # Корневой кластер - файлы непосредственно в корневом пакете
-                if rel_path == root_package or (
-                    rel_path.startswith(f"{root_package}/")
-                    and "/" not in rel_path[len(root_package) + 1 :]
-                ):
-                    return cluster_name
-            elif (
-                rel_path.startswith(f"{root_package}/{path_prefix}/")
-                or rel_path == f"{root_package}/{path_prefix}"
+        # Корневой кластер - файлы непосредственно в корневом пакете
+        if self._root_cluster is not None:
+            root_package = self.project_structure.root_package_name
+            if rel_path == root_package or (
+                rel_path.startswith(f"{root_package}/")
+                and "/" not in rel_path[len(root_package) + 1 :]
             ):
-                return cluster_name
+                return self._root_cluster
 
         # По умолчанию - корневой кластер
         return "Root"
 
-    def get_node_label(self, file_path: str, cluster: str) -> str:
-        """Генерирует читаемую метку для узла."""
-        rel_path = self.normalize_path(file_path)
-        root_package = self.project_structure.root_package_name
-
+    def _label_from_rel(self, file_path: str, rel_path: str, cluster: str) -> str:
+        """Генерирует метку узла по нормализованному пути к файлу."""
         if cluster == "Root":
             return rel_path
 
-        for (
-            path_prefix,
-            cluster_name,
-        ) in self.project_structure.cluster_mappings.items():
-            if cluster_name == cluster and path_prefix:
-                prefix = f"{root_package}/{path_prefix}/"
-                if rel_path.startswith(prefix):
-                    return rel_path[len(prefix) :]
+        for prefix, _, cluster_name in self._cluster_prefixes:
+            if cluster_name == cluster and rel_path.startswith(prefix):
+                return rel_path[len(prefix) :]
 
         return os.path.basename(file_path)
 
@@ -127,65 +334,258 @@ class ProjectAnalyzer:
         python_files = self.find_python_files()
 
         for file_path in python_files:
-            module_name = self.get_module_name(file_path)
-            cluster = self.get_cluster_for_file(file_path)
+            # Интернирование строк ускоряет их сравнение в словарях и множествах
+            file_path = sys.intern(file_path)
+            rel_path = self.normalize_path(file_path)
+            module_name = sys.intern(self._module_name_from_rel(file_path, rel_path))
+            cluster = sys.intern(self._cluster_from_rel(rel_path))
             module = PythonModule(
-                file_path=file_path, module_name=module_name, cluster=cluster
+                file_path=file_path,
+                module_name=module_name,
+                cluster=cluster,
+                normalized_path=rel_path,
+                label=self._label_from_rel(file_path, rel_path, cluster),
+                idx=len(self.module_list),
             )
 
             self.modules[file_path] = module
+            self.module_list.append(module)
             self.module_by_name[module_name] = module
+            self.modules_by_cluster[cluster].append(module)
+
+        for modules in self.modules_by_cluster.values():
+            modules.sort(key=lambda m: m.module_name)
 
+        self.build_import_index()
         self.logger.info(f"Загружено {len(self.modules)} модулей")
 
+    def build_import_index(self) -> None:
+        """Строит индекс префиксов имен модулей для разрешения импортов."""
+        self._descendant_index = {}
+        for name, module in self.module_by_name.items():
+            parts = name.split(".")
+            for i in range(1, len(parts)):
+                prefix = ".".join(parts[:i])
+                current = self._descendant_index.get(prefix)
+                if current is None or len(name) > len(current.module_name):
+                    self._descendant_index[prefix] = module
+
     def analyze_imports(self) -> None:
         """Анализирует импорты во всех модулях проекта."""
+        for module, imports in self._iter_module_imports():
+            module.imported_modules = imports
+
+            # Создаем зависимости для модулей внутри проекта
+            for imported_module_name, imported_objects in imports:
+                # Проверяем, импортируется ли модуль из нашего проекта
+                target_module = self.resolve_import(imported_module_name)
+                if target_module:
+                    self.add_dependency(module, target_module, imported_objects)
+
+        self.logger.info(
+            f"Обнаружено {len(self.edge_objects)} зависимостей импортов"
+        )
+
+    def add_dependency(
+        self,
+        source_module: PythonModule,
+        target_module: PythonModule,
+        imported_objects: List[str],
+    ) -> None:
+        """Добавляет зависимость, объединяя объекты повторных импортов."""
+        key = source_module.idx * len(self.module_list) + target_module.idx
+        edge_id = self._edge_ids.get(key)
+        if edge_id is None:
+            self._edge_ids[key] = len(self.edge_objects)
+            self.edge_src.append(source_module.idx)
+            self.edge_dst.append(target_module.idx)
+            self.edge_objects.append(list(imported_objects))
+        else:
+            objects = self.edge_objects[edge_id]
+            objects.extend(obj for obj in imported_objects if obj not in objects)
+
+    def iter_edges(self) -> Iterator[Dependency]:
+        """Возвращает зависимости в виде объектов Dependency по мере обхода."""
+        modules = self.module_list
+        for src, dst, objects in zip(self.edge_src, self.edge_dst, self.edge_objects):
+            yield Dependency(
+                source_module=modules[src],
+                target_module=modules[dst],
+                imported_objects=objects,
+            )
+
+    @property
+    def dependencies(self) -> List[Dependency]:
+        """
+        Зависимости между модулями проекта.
+
+        При каждом обращении строится новый список за O(E): для обхода
+        используйте iter_edges(), для проверки наличия рёбер - edge_objects.
+        """
+        return list(self.iter_edges())
+
+    def _iter_module_imports(
+        self,
+    ) -> Iterator[Tuple[PythonModule, List[Tuple[str, List[str]]]]]:
+        """
+        Извлекает импорты всех модулей проекта.
+
+        Неизмененные с прошлого запуска файлы берутся из кэша. Для небольшого
+        числа оставшихся файлов разбор выполняется последовательно, иначе -
+        в пуле процессов, чтобы не платить за его запуск на паре файлов.
+        Модули возвращаются в порядке self.modules независимо от состояния
+        кэша, чтобы порядок рёбер (и компоновка графа) не менялся между запусками.
+        """
+        cache = self.load_cache() if self.use_cache else {}
+        fresh_cache: Dict[str, list] = {}
+        cache_keys: Dict[str, list] = {}
+        pending: List[PythonModule] = []
+        # Импорты модулей по путям файлов
+        results: Dict[str, List[Tuple[str, List[str]]]] = {}
+
         for module in self.modules.values():
             try:
-                with open(module.file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-
-                tree = ast.parse(content, module.file_path)
-                visitor = ImportVisitor(module.module_name, self.logger)
-                visitor.visit(tree)
-
-                module.imported_modules = visitor.imports
-
-                # Создаем зависимости для модулей внутри проекта
-                for imported_module_name, imported_objects in visitor.imports:
-                    # Проверяем, импортируется ли модуль из нашего проекта
-                    target_module = self.resolve_import(imported_module_name)
-                    if target_module:
-                        dependency = Dependency(
-                            source_module=module,
-                            target_module=target_module,
-                            imported_objects=imported_objects,
+                st = os.stat(module.file_path)
+            except OSError:
+                pending.append(module)
+                continue
+
+            key = [st.st_mtime_ns, st.st_size, module.module_name]
+            entry = cache.get(module.file_path)
+            if _is_valid_cache_entry(entry) and entry[:3] == key:
+                fresh_cache[module.file_path] = entry
+                results[module.file_path] = [
+                    (name, objects) for name, objects in entry[3]
+                ]
+            else:
+                cache_keys[module.file_path] = key
+                pending.append(module)
+
+        with ExitStack() as stack:
+            tasks = None
+            if len(pending) >= _PARALLEL_THRESHOLD:
+                try:
+                    executor = stack.enter_context(ProcessPoolExecutor())
+                    futures = [
+                        executor.submit(
+                            _extract_imports, module.file_path, module.module_name
                         )
-                        self.dependencies.add(dependency)
+                        for module in pending
+                    ]
+                except (ImportError, NotImplementedError, OSError) as e:
+                    # Например, если в системе нет sem_open
+                    self.logger.warning(
+                        f"Пул процессов недоступен, файлы разбираются последовательно: {e}"
+                    )
+                else:
+                    tasks = (
+                        (module, future.result)
+                        for module, future in zip(pending, futures)
+                    )
+
+            if tasks is None:
+                tasks = (
+                    (
+                        module,
+                        partial(
+                            _extract_imports,
+                            module.file_path,
+                            module.module_name,
+                            self.logger,
+                        ),
+                    )
+                    for module in pending
+                )
+
+            for module, imports in self._gather_imports(tasks):
+                key = cache_keys.get(module.file_path)
+                if key is not None:
+                    fresh_cache[module.file_path] = key + [imports]
+                results[module.file_path] = imports
+
+        # Записи удаленных и измененных файлов в новый кэш не попадают
+        if self.use_cache and (pending or len(fresh_cache) != len(cache)):
+            self.save_cache(fresh_cache)
+
+        # Файлы с ошибками разбора пропускаются
+        for module in self.modules.values():
+            imports = results.get(module.file_path)
+            if imports is not None:
+                yield module, imports
+
+    def _gather_imports(
+        self,
+        tasks: Iterable[Tuple[PythonModule, Callable[[], List[Tuple[str, List[str]]]]]],
+    ) -> Iterator[Tuple[PythonModule, List[Tuple[str, List[str]]]]]:
+        """Выполняет задачи извлечения импортов, логируя ошибки разбора."""
+        for module, task in tasks:
+            try:
+                imports = task()
             except SyntaxError:
                 self.logger.warning(f"Не удалось разобрать файл: {module.file_path}")
+                continue
             except Exception as e:
                 self.logger.error(f"Ошибка при обработке {module.file_path}: {e}")
+                continue
+            yield module, imports
 
-        self.logger.info(f"Обнаружено {len(self.dependencies)} зависимостей импортов")
+    def load_cache(self) -> Dict[str, list]:
+        """
+        Загружает кэш импортов с диска.
+
+        Returns:
+            Словарь путь -> [mtime_ns, размер, имя модуля, импорты] или пустой
+            словарь, если кэш отсутствует или устарел
+        """
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning(f"Не удалось загрузить кэш импортов: {e}")
+            return {}
+
+        if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+            return {}
+        entries = data.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    def save_cache(self, entries: Dict[str, list]) -> None:
+        """Атомарно сохраняет кэш импортов на диск."""
+        cache_dir = os.path.dirname(self.cache_path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"version": _CACHE_VERSION, "entries": entries}, f)
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            self.logger.warning(f"Не удалось сохранить кэш импортов: {e}")
 
     def resolve_import(self, imported_module_name: str) -> Optional[PythonModule]:
         """Разрешает имя импортированного модуля в объект модуля."""
         # Прямое соответствие
-        if imported_module_name in self.module_by_name:
-            return self.module_by_name[imported_module_name]
-
-        # Поиск подмодулей или родительских модулей
-        possible_modules = [
-            name
-            for name in self.module_by_name
-            if name.startswith(f"{imported_module_name}.")
-            or imported_module_name.startswith(f"{name}.")
-        ]
-
-        if possible_modules:
-            # Берем наиболее конкретное соответствие
-            best_match = max(possible_modules, key=len)
-            return self.module_by_name[best_match]
+        module = self.module_by_name.get(imported_module_name)
+        if module is not None:
+            return module
+
+        # Подмодули длиннее родительских модулей, поэтому наиболее конкретное
+        # соответствие - самый длинный подмодуль, если он есть
+        module = self._descendant_index.get(imported_module_name)
+        if module is not None:
+            return module
+
+        # Иначе ищем ближайший родительский модуль
+        name = imported_module_name
+        while "." in name:
+            name = name.rsplit(".", 1)[0]
+            module = self.module_by_name.get(name)
+            if module is not None:
+                return module
 
         return None
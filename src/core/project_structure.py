@@ -1,7 +1,8 @@
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-@dataclass
+
+@dataclass(slots=True, frozen=True, eq=False)
 class ProjectStructure:
     """Определяет структуру проекта и соответствующие кластеры."""
 
@@ -17,26 +18,38 @@ class ProjectStructure:
         "#f781bf30",  # розовый прозрачный
     ]
 
-    def __init__(
-        self, root_package_name: str, cluster_mappings: Optional[Dict[str, str]] = None
-    ):
-        """
-        Инициализирует структуру проекта.
-
-        Args:
-            root_package_name: Имя корневого пакета проекта
-            cluster_mappings: Словарь маппинга путей к кластерам
-        """
-        self.root_package_name = root_package_name
+    # Имя корневого пакета проекта
+    root_package_name: str
+    # Словарь маппинга подпутей к кластерам
+    cluster_mappings: Optional[Dict[str, str]] = None
+    # Порядок отображения кластеров, их номера и цвета вычисляются при создании
+    cluster_order: List[str] = field(init=False)
+    cluster_to_index: Dict[str, int] = field(init=False)
+    cluster_to_color: Dict[str, str] = field(init=False)
 
-        # Словарь маппинга подпутей к кластерам
-        self.cluster_mappings = cluster_mappings or {
+    def __post_init__(self) -> None:
+        """Вычисляет порядок, номера и цвета кластеров."""
+        # По умолчанию все файлы относятся к корневому кластеру
+        cluster_mappings = self.cluster_mappings or {
             "": "Root",  # Корневые файлы
         }
 
-        # Порядок отображения кластеров
-        self.cluster_order = list(set(self.cluster_mappings.values()))
-        if "Root" in self.cluster_order:
+        # Порядок отображения кластеров (в порядке объявления)
+        cluster_order = list(dict.fromkeys(cluster_mappings.values()))
+        if "Root" in cluster_order:
             # Root всегда должен быть первым
-            self.cluster_order.remove("Root")
-            self.cluster_order.insert(0, "Root")
\ No newline at end of file
+            cluster_order.remove("Root")
+            cluster_order.insert(0, "Root")
+
+        # Номера и цвета кластеров
+        cluster_to_index = {cluster: idx for idx, cluster in enumerate(cluster_order)}
+        cluster_to_color = {
+            cluster: self.CLUSTER_COLORS[idx % len(self.CLUSTER_COLORS)]
+            for idx, cluster in enumerate(cluster_order)
+        }
+
+        # Экземпляр неизменяемый, поэтому поля задаются через object.__setattr__
+        object.__setattr__(self, "cluster_mappings", cluster_mappings)
+        object.__setattr__(self, "cluster_order", cluster_order)
+        object.__setattr__(self, "cluster_to_index", cluster_to_index)
+        object.__setattr__(self, "cluster_to_color", cluster_to_color)
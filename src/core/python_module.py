@@ -2,7 +2,7 @@ from dataclasses import dataclass, field
 from typing import List, Optional, Tuple
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class PythonModule:
     """Представляет Python модуль с его путем и именем."""
 
@@ -12,6 +12,9 @@ class PythonModule:
     imported_modules: List[Tuple[str, List[str]]] = field(
         default_factory=list
     )  # Импортированные модули
+    normalized_path: Optional[str] = None  # Путь относительно корня проекта
+    label: Optional[str] = None  # Метка узла на графе
+    idx: int = -1  # Порядковый номер модуля в анализаторе
 
     def __hash__(self):
         return hash(self.file_path)
@@ -14,45 +14,121 @@ SVG-диаграмму, отображающую взаимосвязи межд
     - Graphviz software установленный в системе
 """
 
+from __future__ import annotations
+
 import argparse
+import functools
 import logging
 import os
+import shutil
+import subprocess
 import sys
-import yaml
-from typing import Dict, Optional
-from .core import (
-    DependencyGraphBuilder,
-    ProjectAnalyzer,
-    ProjectDetector,
-    ProjectStructure,
+
+logger = logging.getLogger(__name__)
+
+# Стандартные имена конфигурационных файлов в порядке приоритета
+_DEFAULT_CONFIGS = (
+    "deps.yml",
+    "deps.yaml",
+    "import_analyzer.yml",
+    "import_analyzer.yaml",
 )
+_CONFIG_CANDIDATES = frozenset(_DEFAULT_CONFIGS)
+
 
-try:
-    import graphviz
-except ImportError:
-    print("Error: graphviz package is not installed. Run 'pip install graphviz'")
-    sys.exit(1)
-try:
-    import yaml
-
-    YAML_AVAILABLE = True
-except ImportError:
-    YAML_AVAILABLE = False
-    print(
-        "Warning: PyYAML package is not installed. Config file support will be disabled."
+@functools.lru_cache(maxsize=1)
+def detect_graphviz_version() -> str | None:
+    """
+    Определяет версию установленного Graphviz.
+
+    Returns:
+        Строка с версией или None, если программа dot не найдена
+    """
+    dot_bin = shutil.which("dot")
+    if dot_bin is None:
+        return None
+    result = subprocess.run(
+        [dot_bin, "-V"], capture_output=True, text=True, check=False
     )
-    print("Run 'pip install pyyaml' to enable configuration file support.")
+    # dot выводит версию в stderr
+    return (result.stderr or result.stdout).strip() or None
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
-logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=1)
+def _import_yaml():
+    """
+    Импортирует PyYAML при первом обращении к конфигурации.
+
+    Returns:
+        Модуль yaml или None, если PyYAML не установлен
+    """
+    try:
+        import yaml
+    except ImportError:
+        # Предупреждение можно отключить переменной окружения DEPS_QUIET
+        if not os.environ.get("DEPS_QUIET"):
+            sys.stderr.write(
+                "Warning: PyYAML package is not installed. "
+                "Config file support will be disabled.\n"
+                "Run 'pip install pyyaml' to enable configuration file support.\n"
+            )
+        return None
+    return yaml
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_yaml(path: str, mtime_ns: int) -> dict:
+    """
+    Читает и разбирает YAML-файл.
+
+    Результат кэшируется по абсолютному пути и времени изменения файла,
+    поэтому его нельзя изменять на месте.
+
+    Args:
+        path: Абсолютный путь к файлу
+        mtime_ns: Время последнего изменения файла в наносекундах
+    """
+    yaml = _import_yaml()
+    # Загрузчик на C из LibYAML, если PyYAML собран с ней
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=loader) or {}
+
+
+def _load_config_file(path: str, mtime_ns: int) -> dict:
+    """
+    Загружает найденный конфигурационный файл.
+
+    PyYAML импортируется только здесь, то есть лишь при наличии файла.
+
+    Args:
+        path: Путь к файлу
+        mtime_ns: Время последнего изменения файла в наносекундах
+    """
+    if _import_yaml() is None:
+        logger.warning(
+            "PyYAML не установлен. Не удается загрузить конфигурационный файл: %s",
+            path,
+        )
+        return {}
+    return _parse_yaml(os.path.abspath(path), mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def _find_project_root(specified_path: str | None, cwd: str) -> str:
+    """
+    Определяет корневую директорию проекта с кэшированием результата.
+
+    Args:
+        specified_path: Опционально указанный путь к проекту
+        cwd: Текущая директория, от которой зависит результат поиска
+    """
+    from .core import ProjectDetector
+
+    return ProjectDetector.find_project_root(specified_path)
 
 
-def load_config(config_path: Optional[str] = None) -> Dict:
+def load_config(config_path: str | None = None) -> dict:
     """
     Загружает конфигурацию проекта из YAML-файла, если он существует.
 
@@ -62,45 +138,43 @@ def load_config(config_path: Optional[str] = None) -> Dict:
     Returns:
         Словарь с настройками или пустой словарь, если файл не найден или PyYAML не установлен
     """
-    # Если PyYAML не установлен, возвращаем пустой словарь
-    if not YAML_AVAILABLE:
-        if config_path:
-            logger.warning(
-                "PyYAML не установлен. Не удается загрузить конфигурационный файл."
-            )
-        return {}
-
-    # Если путь указан и файл существует
-    if config_path and os.path.exists(config_path):
+    # Если путь указан и файл существует: один stat вместо exists и stat
+    if config_path:
         try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                return yaml.safe_load(f)
-        except Exception as e:
-            logger.warning(f"Не удалось загрузить конфигурационный файл: {e}")
-            return {}
-
-    # Проверяем стандартные имена конфигурационных файлов
-    default_configs = [
-        "deps.yml",
-        "deps.yaml",
-        "import_analyzer.yml",
-        "import_analyzer.yaml",
-    ]
-
-    for config_name in default_configs:
-        if os.path.exists(config_name):
+            mtime_ns = os.stat(config_path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns is not None:
             try:
-                with open(config_name, "r", encoding="utf-8") as f:
-                    return yaml.safe_load(f)
+                return _load_config_file(config_path, mtime_ns)
             except Exception as e:
-                logger.warning(f"Не удалось загрузить {config_name}: {e}")
+                logger.warning("Не удалось загрузить конфигурационный файл: %s", e)
+                return {}
+
+    # Проверяем стандартные имена конфигурационных файлов за одно чтение директории
+    try:
+        with os.scandir(".") as entries:
+            found = {e.name: e for e in entries if e.name in _CONFIG_CANDIDATES}
+    except OSError:
+        found = {}
+
+    # Порядок _DEFAULT_CONFIGS задает приоритет при наличии нескольких файлов
+    for config_name in _DEFAULT_CONFIGS:
+        entry = found.get(config_name)
+        if entry is not None:
+            try:
+                # DirEntry кэширует результат stat
+                mtime_ns = entry.stat().st_mtime_ns
+                return _load_config_file(entry.path, mtime_ns)
+            except Exception as e:
+                logger.warning("Не удалось загрузить %s: %s", config_name, e)
 
     # Возвращаем пустой словарь, если конфигурационный файл не найден
     return {}
 
 
-def main() -> None:
-    """Основная функция для анализа импортов и генерации диаграммы зависимостей."""
+def _build_parser() -> argparse.ArgumentParser:
+    """Создает парсер аргументов командной строки."""
     parser = argparse.ArgumentParser(
         description="Анализирует зависимости импортов в Python и генерирует SVG диаграмму"
     )
@@ -136,12 +210,45 @@ def main() -> None:
     )
     parser.add_argument(
         "--engine",
-        choices=["dot", "neato", "fdp", "twopi", "circo"],
-        default="dot",
-        help="Алгоритм компоновки графа: dot (иерархический), neato (пружинный), fdp (силовой), twopi (радиальный), circo (круговой)",
+        choices=["auto", "dot", "sfdp", "graphml", "neato", "fdp", "twopi", "circo"],
+        default="auto",
+        help="Алгоритм компоновки графа: auto (dot или sfdp по размеру графа), dot (иерархический), sfdp (силовой для больших графов), graphml (sfdp и экспорт в GraphML), neato (пружинный), fdp (силовой), twopi (радиальный), circo (круговой)",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Не использовать кэш импортов в директории .dep_graph_cache",
+    )
+
+    return parser
+
+
+_PARSER = _build_parser()
 
-    args = parser.parse_args()
+
+def main() -> None:
+    """Основная функция для анализа импортов и генерации диаграммы зависимостей."""
+    args = _PARSER.parse_args()
+
+    # graphviz импортируется после разбора аргументов, чтобы не замедлять --help
+    try:
+        import graphviz
+    except ImportError:
+        sys.stderr.write(
+            "Error: graphviz package is not installed. Run 'pip install graphviz'\n"
+        )
+        sys.exit(1)
+
+    # Модули анализа импортируются только для реального запуска, не для --help
+    from .core import ProjectAnalyzer, ProjectDetector, ProjectStructure
+
+    # Настройка логирования, если обработчики еще не установлены вызывающим кодом
+    if not logging.getLogger().handlers:
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
 
     # Настройка уровня логирования
     if args.verbose:
@@ -149,9 +256,9 @@ def main() -> None:
 
     # Проверка установки Graphviz
     try:
-        graphviz_version = os.popen("dot -V").read()
+        graphviz_version = detect_graphviz_version()
         if graphviz_version:
-            logger.info(f"Graphviz обнаружен: {graphviz_version.strip()}")
+            logger.info("Graphviz обнаружен: %s", graphviz_version)
         else:
             logger.warning(
                 "Не удалось определить версию Graphviz, но продолжаем работу"
@@ -163,7 +270,9 @@ def main() -> None:
     config = load_config(args.config)
 
     # Определение корневой директории проекта
-    project_root = ProjectDetector.find_project_root(args.project_root)
+    if args.no_cache:
+        _find_project_root.cache_clear()
+    project_root = _find_project_root(args.project_root, os.getcwd())
 
     # Определение структуры проекта
     if args.root_package or "root_package" in config:
@@ -181,17 +290,21 @@ def main() -> None:
         # Автоматическое определение структуры проекта
         project_structure = ProjectDetector.detect_project_structure(project_root)
 
-    logger.info(f"Используется корневой пакет: {project_structure.root_package_name}")
-    logger.info(
-        f"Определены кластеры: {list(project_structure.cluster_mappings.values())}"
-    )
+    logger.info("Используется корневой пакет: %s", project_structure.root_package_name)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Определены кластеры: %s",
+            list(project_structure.cluster_mappings.values()),
+        )
 
     # Создание и запуск анализатора проекта
-    analyzer = ProjectAnalyzer(project_root, project_structure, logger)
+    analyzer = ProjectAnalyzer(
+        project_root, project_structure, logger, use_cache=not args.no_cache
+    )
     analyzer.load_modules()
     analyzer.analyze_imports()
 
-    if not analyzer.dependencies:
+    if not analyzer.edge_objects:
         logger.warning("Зависимости между модулями проекта не найдены.")
         # Создаем простую диаграмму-заполнитель
         graph = graphviz.Digraph(
@@ -208,40 +321,46 @@ def main() -> None:
             fillcolor="#f5f5f5",
         )
     else:
+        # Построитель графа нужен только при наличии зависимостей
+        from .core import DependencyGraphBuilder
+
         # Создание и отрисовка графа зависимостей
         graph_builder = DependencyGraphBuilder(
-            analyzer, reverse_arrows=not args.normal_arrows, logger=logger
+            analyzer,
+            reverse_arrows=not args.normal_arrows,
+            logger=logger,
+            engine=args.engine,
+            graphml_path=f"{args.output}.graphml",
+            rankdir=args.direction,
         )
         graph = graph_builder.build_graph()
-        graph.engine = args.engine  # Устанавливаем выбранный движок
-        # Переопределяем направление графа если указано в параметрах
-        graph.attr(rankdir=args.direction)
 
     try:
-        # Явно задаем формат
-        graph.format = "svg"
-        output_file = f"{args.output}.gv"
-
-        # Сначала сохраняем DOT-файл для возможной отладки
-        graph.save(output_file)
-        logger.info(f"Сгенерирован DOT-файл: {output_file}")
-
-        # Затем рендерим в SVG с улучшенными настройками
-        output_path = graph.render(args.output, format="svg", cleanup=False)
-        logger.info(f"Сгенерирована SVG-диаграмма: {output_path}")
-
-        # Проверка размера файла
-        file_size = os.path.getsize(output_path)
-        logger.info(f"Размер SVG-файла: {file_size} байт")
-
-        # Открываем SVG в браузере на macOS
+        # DOT-файл нужен только для отладки
+        if args.verbose:
+            output_file = graph.save(f"{args.output}.gv")
+            logger.info("Сгенерирован DOT-файл: %s", output_file)
+
+        # DOT-код передается в Graphviz через канал, без промежуточного файла
+        svg_bytes = graph.pipe(format="svg")
+        output_path = f"{args.output}.svg"
+        with open(output_path, "wb") as f:
+            f.write(svg_bytes)
+        logger.info("Сгенерирована SVG-диаграмма: %s", output_path)
+        logger.info("Размер SVG-файла: %d байт", len(svg_bytes))
+
+        # Открываем SVG в браузере на macOS, не дожидаясь завершения open
         if sys.platform == "darwin":
             try:
-                os.system(f"open {output_path}")
-            except Exception as e:
-                logger.warning(f"Не удалось открыть SVG: {e}")
+                subprocess.Popen(
+                    ["open", output_path],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            except OSError as e:
+                logger.warning("Не удалось открыть SVG: %s", e)
     except Exception as e:
-        logger.error(f"Не удалось сгенерировать SVG-диаграмму: {e}")
+        logger.error("Не удалось сгенерировать SVG-диаграмму: %s", e)
         logger.error(
             "Убедитесь, что Graphviz установлен в вашей системе: https://graphviz.org/download/"
         )